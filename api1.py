@@ -1,25 +1,67 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request
 import joblib
 import numpy as np
+import numba
+from numba import types
+import orjson
+import msgspec
 from flask_cors import CORS
 import pandas as pd
+import functools
+import threading
 
 app = Flask(__name__)
 CORS(app)
 
-# Load model and encoders
-model = joblib.load("player_cluster_model.pkl")
-scaler = joblib.load("scaler.pkl")
-encoders = joblib.load("encoders.pkl")
-data = pd.read_json("dataset.json")  # original player dataset with cluster info
+# Load the scaler + KMeans projection train.py folds the model into (see there) and
+# the label classes the encoders were fitted on. PROJ_W[j] is feature j's weight per
+# cluster, PROJ_B the per-cluster bias; a player's cluster is argmax(x @ PROJ_W + PROJ_B).
+# Mapped read-only, so every gunicorn worker shares the same pages
+PROJ_W = np.load("proj_w.npy", mmap_mode="r")  # (D, K)
+PROJ_B = np.load("proj_b.npy", mmap_mode="r")  # (K,)
+CLASSES = joblib.load("classes.pkl")
+
+# Original player dataset, only the columns used for recommendations.
+# train.py writes the Parquet copy; fall back to the JSON source without it.
+DATASET_COLUMNS = ["id", "level", "rank", "maxBudgetPerSession"]
+try:
+    data = pd.read_parquet("dataset.parquet", columns=DATASET_COLUMNS)
+except (FileNotFoundError, ImportError):
+    data = pd.read_json("dataset.json")[DATASET_COLUMNS]
 
 # Load cluster assignments if they exist
 try:
     clusters = pd.read_json("player_clusters.json")
-    data = pd.merge(data, clusters, on="id", how="left")
+    id_to_cluster = dict(zip(clusters["id"].values, clusters["cluster"].values.astype(np.int32)))
+    data["cluster"] = data["id"].map(id_to_cluster).fillna(-1).astype(np.int32)
 except:
     data["cluster"] = -1
 
+# Top 5 players per cluster, precomputed once for /cluster-player: stable-sort
+# the rows by cluster, then each cluster's first 5 positions are its records
+def _build_recs(data, n_clusters):
+    order = np.argsort(data["cluster"].values, kind="stable")
+    sorted_clusters = data["cluster"].values[order]
+    starts = np.searchsorted(sorted_clusters, np.arange(n_clusters))
+    stops = np.searchsorted(sorted_clusters, np.arange(n_clusters), side="right")
+    return {
+        c: data.iloc[order[start:min(start + 5, stop)]][DATASET_COLUMNS].to_dict(orient="records")
+        for c, (start, stop) in enumerate(zip(starts, stops))
+        if stop > start
+    }
+
+RECS = _build_recs(data, len(PROJ_B))
+# False when the dataset is empty or nothing in it has a cluster assignment
+HAS_RECS = bool(RECS)
+
+# Column index of every known label, and where each one-hot block starts
+SERVICES_IDX = {c: i for i, c in enumerate(CLASSES["services"])}
+GOALS_IDX = {c: i for i, c in enumerate(CLASSES["goals"])}
+LANGUAGES_IDX = {c: i for i, c in enumerate(CLASSES["languages"])}
+OFFS_SERVICES = 4
+OFFS_GOALS = OFFS_SERVICES + len(SERVICES_IDX)
+OFFS_LANGUAGES = OFFS_GOALS + len(GOALS_IDX)
+
 levels_map = {
     "beginner": 1,
     "recreational": 2,
@@ -29,45 +71,102 @@ levels_map = {
     "professional": 6
 }
 
+# Request body for /cluster-player, decoded and validated in one pass
+class PlayerProfile(msgspec.Struct):
+    level: str
+    desiredServices: list[str]
+    goals: list[str]
+    languages: list[str]
+    rank: float = 0
+    maxBudgetPerSession: float = 0
+    travelDistance: float = 0
+
+profile_decoder = msgspec.json.Decoder(PlayerProfile)
+
+# Compiled scoring kernel for _predict below: each cluster's score is the numeric
+# fields' dot product plus the weight rows of the active labels, no dense row needed
+@numba.njit(
+    types.int64(
+        types.float32[::1],
+        types.int64[::1],
+        types.Array(types.float32, 2, "C", readonly=True),
+        types.Array(types.float32, 1, "C", readonly=True),
+    ),
+    cache=True,
+    fastmath=True,
+)
+def _nearest_cluster(x, active, weights, bias):
+    best_k = 0
+    best_score = np.float32(0.0)
+    for k in range(bias.shape[0]):
+        score = bias[k]
+        for i in range(x.shape[0]):
+            score += x[i] * weights[i, k]
+        for j in active:
+            score += weights[j, k]
+        if k == 0 or score > best_score:
+            best_k = k
+            best_score = score
+    return best_k
+
+_buffers = threading.local()
+
+# Cluster assignment for one player, memoized on the canonicalized profile
+# (label lists passed as sorted, de-duplicated tuples so they are hashable and
+# order-free, and each label's weights are added at most once)
+@functools.lru_cache(maxsize=4096)
+def _predict(level, rank, budget, travel, services, goals, languages):
+    # Numeric field and active-label buffers are allocated once per thread and reused
+    if not hasattr(_buffers, "x"):
+        _buffers.x = np.empty(4, dtype=np.float32)
+        _buffers.active = np.empty(len(PROJ_W), dtype=np.int64)
+    x, active = _buffers.x, _buffers.active
+
+    x[:] = rank, budget, travel, levels_map.get(level, 1)
+
+    # Column of each known label; absent labels contribute nothing
+    n = 0
+    for offset, index, labels in (
+        (OFFS_SERVICES, SERVICES_IDX, services),
+        (OFFS_GOALS, GOALS_IDX, goals),
+        (OFFS_LANGUAGES, LANGUAGES_IDX, languages),
+    ):
+        for label in labels:
+            j = index.get(label)
+            if j is not None:
+                active[n] = offset + j
+                n += 1
+    return _nearest_cluster(x, active[:n], PROJ_W, PROJ_B)
+
+# Serialize responses with orjson rather than jsonify
+def json_response(obj, status=200):
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY), status=status, mimetype="application/json"
+    )
 
 @app.route("/cluster-player", methods=["POST"])
 def cluster_player():
-    d = request.json
     try:
-        # Encode categorical lists
-        services_encoded = encoders["services"].transform([d["desiredServices"]])
-        goals_encoded = encoders["goals"].transform([d["goals"]])
-        lang_encoded = encoders["languages"].transform([d["languages"]])
-
-        # Numeric fields
-        level = levels_map.get(d["level"], 1)
-        rank = d.get("rank", 0)
-        budget = d.get("maxBudgetPerSession", 0)
-        travel = d.get("travelDistance", 0)
-
-        # Combine features
-        X = np.concatenate(
-            [[rank, budget, travel, level],
-             services_encoded[0], goals_encoded[0], lang_encoded[0]]
-        ).reshape(1, -1)
-
-        # Scale and predict
-        X_scaled = scaler.transform(X)
-        cluster = int(model.predict(X_scaled)[0])
-
-        # Find top 5 similar players in same cluster
-        similar_players = (
-            data[data["cluster"] == cluster][["id", "level", "rank", "maxBudgetPerSession"]]
-            .head(5)
-            .to_dict(orient="records")
+        d = profile_decoder.decode(request.get_data())
+        cluster = _predict(
+            d.level,
+            d.rank,
+            d.maxBudgetPerSession,
+            d.travelDistance,
+            tuple(sorted(set(d.desiredServices))),
+            tuple(sorted(set(d.goals))),
+            tuple(sorted(set(d.languages))),
         )
 
-        return jsonify({
+        # Top 5 similar players in same cluster
+        similar_players = RECS.get(cluster, []) if HAS_RECS else []
+
+        return json_response({
             "cluster": cluster,
             "recommendedPlayers": similar_players
         })
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return json_response({"error": str(e)}, 400)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request
 import joblib
 import numpy as np
+import numba
+from numba import types
 from flask_cors import CORS
 import pandas as pd
 import uuid
+import functools
+import threading
+import sqlite3
+import orjson
+import msgspec
+from typing import Optional, Union
 # --- New Imports for Swagger ---
 from flasgger import Swagger, swag_from
 
@@ -20,26 +28,61 @@ app.config['SWAGGER'] = {
 swagger = Swagger(app)
 # -----------------------------
 
-# Load model and encoders
-model = joblib.load("player_cluster_model.pkl")
-scaler = joblib.load("scaler.pkl")
-encoders = joblib.load("encoders.pkl")
-# NOTE: In a real app, ensure dataset.json, player_cluster_model.pkl, scaler.pkl, and encoders.pkl exist.
+# Load the scaler + KMeans projection train.py folds the model into (see there) and
+# the label classes the encoders were fitted on. PROJ_W[j] is feature j's weight per
+# cluster, PROJ_B the per-cluster bias; a player's cluster is argmax(x @ PROJ_W + PROJ_B).
+# Mapped read-only, so every gunicorn worker shares the same pages
+PROJ_W = np.load("proj_w.npy", mmap_mode="r")  # (D, K)
+PROJ_B = np.load("proj_b.npy", mmap_mode="r")  # (K,)
+CLASSES = joblib.load("classes.pkl")
+# NOTE: In a real app, ensure dataset.json, proj_w.npy, proj_b.npy, and classes.pkl exist.
 # For this example, assuming they are available.
+# Original player dataset, only the columns used for recommendations.
+# train.py writes the Parquet copy; fall back to the JSON source without it.
+DATASET_COLUMNS = ["id", "level", "rank", "maxBudgetPerSession"]
 try:
-    data = pd.read_json("dataset.json")  # original player dataset with cluster info
+    try:
+        data = pd.read_parquet("dataset.parquet", columns=DATASET_COLUMNS)
+    except (FileNotFoundError, ImportError):
+        data = pd.read_json("dataset.json")[DATASET_COLUMNS]
 except:
     data = pd.DataFrame(columns=["id", "level", "rank", "maxBudgetPerSession", "cluster"])
-    print("Warning: 'dataset.json' not found or failed to load. Using empty DataFrame for recommendations.")
+    print("Warning: neither 'dataset.parquet' nor 'dataset.json' could be loaded. Using empty DataFrame for recommendations.")
 
 
 # Load cluster assignments if they exist
 try:
     clusters = pd.read_json("player_clusters.json")
-    data = pd.merge(data, clusters, on="id", how="left")
+    id_to_cluster = dict(zip(clusters["id"].values, clusters["cluster"].values.astype(np.int32)))
+    data["cluster"] = data["id"].map(id_to_cluster).fillna(-1).astype(np.int32)
 except:
     data["cluster"] = -1
 
+# Column index of every known label, and where each one-hot block starts
+SERVICES_IDX = {c: i for i, c in enumerate(CLASSES["services"])}
+GOALS_IDX = {c: i for i, c in enumerate(CLASSES["goals"])}
+LANGUAGES_IDX = {c: i for i, c in enumerate(CLASSES["languages"])}
+OFFS_SERVICES = 4
+OFFS_GOALS = OFFS_SERVICES + len(SERVICES_IDX)
+OFFS_LANGUAGES = OFFS_GOALS + len(GOALS_IDX)
+
+# Top 5 players per cluster, precomputed once for /cluster-player: stable-sort
+# the rows by cluster, then each cluster's first 5 positions are its records
+def _build_recs(data, n_clusters):
+    order = np.argsort(data["cluster"].values, kind="stable")
+    sorted_clusters = data["cluster"].values[order]
+    starts = np.searchsorted(sorted_clusters, np.arange(n_clusters))
+    stops = np.searchsorted(sorted_clusters, np.arange(n_clusters), side="right")
+    return {
+        c: data.iloc[order[start:min(start + 5, stop)]][DATASET_COLUMNS].to_dict(orient="records")
+        for c, (start, stop) in enumerate(zip(starts, stops))
+        if stop > start
+    }
+
+RECS = _build_recs(data, len(PROJ_B))
+# False when the dataset is empty or nothing in it has a cluster assignment
+HAS_RECS = bool(RECS)
+
 levels_map = {
     "beginner": 1,
     "recreational": 2,
@@ -49,8 +92,132 @@ levels_map = {
     "professional": 6
 }
 
-# Store players in memory (in production, use a database)
-players_db = []
+# Players live in a small SQLite file so every gunicorn worker sees the same list
+# (in production, use a database server)
+PLAYERS_DB_PATH = "players.db"
+_players_local = threading.local()
+
+def players_db():
+    # One connection per thread, opened lazily so none is carried across a fork
+    conn = getattr(_players_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(PLAYERS_DB_PATH, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS players (id TEXT PRIMARY KEY, body BLOB NOT NULL)")
+        _players_local.conn = conn
+    return conn
+
+# Request bodies for the clustering endpoints, decoded and validated in one pass
+class PlayerProfile(msgspec.Struct):
+    level: str
+    desiredServices: list[str]
+    goals: list[str]
+    languages: list[str]
+    rank: float = 0
+    maxBudgetPerSession: float = 0
+    travelDistance: float = 0
+
+class BatchPlayer(PlayerProfile, kw_only=True):
+    id: Union[str, int]
+
+# Column-oriented batch: one list per field, all the same length
+class PlayerColumns(msgspec.Struct):
+    id: list[Union[str, int]]
+    level: list[str]
+    desiredServices: list[list[str]]
+    goals: list[list[str]]
+    languages: list[list[str]]
+    rank: Optional[list[float]] = None
+    maxBudgetPerSession: Optional[list[float]] = None
+    travelDistance: Optional[list[float]] = None
+
+profile_decoder = msgspec.json.Decoder(PlayerProfile)
+batch_decoder = msgspec.json.Decoder(list[BatchPlayer])
+columns_decoder = msgspec.json.Decoder(PlayerColumns)
+
+# Compiled scoring kernel for _predict below: each cluster's score is the numeric
+# fields' dot product plus the weight rows of the active labels, no dense row needed
+@numba.njit(
+    types.int64(
+        types.float32[::1],
+        types.int64[::1],
+        types.Array(types.float32, 2, "C", readonly=True),
+        types.Array(types.float32, 1, "C", readonly=True),
+    ),
+    cache=True,
+    fastmath=True,
+)
+def _nearest_cluster(x, active, weights, bias):
+    best_k = 0
+    best_score = np.float32(0.0)
+    for k in range(bias.shape[0]):
+        score = bias[k]
+        for i in range(x.shape[0]):
+            score += x[i] * weights[i, k]
+        for j in active:
+            score += weights[j, k]
+        if k == 0 or score > best_score:
+            best_k = k
+            best_score = score
+    return best_k
+
+_buffers = threading.local()
+
+# Cluster assignment for one player, memoized on the canonicalized profile
+# (label lists passed as sorted, de-duplicated tuples so they are hashable and
+# order-free, and each label's weights are added at most once)
+@functools.lru_cache(maxsize=4096)
+def _predict(level, rank, budget, travel, services, goals, languages):
+    # Numeric field and active-label buffers are allocated once per thread and reused
+    if not hasattr(_buffers, "x"):
+        _buffers.x = np.empty(4, dtype=np.float32)
+        _buffers.active = np.empty(len(PROJ_W), dtype=np.int64)
+    x, active = _buffers.x, _buffers.active
+
+    x[:] = rank, budget, travel, levels_map.get(level, 1)
+
+    # Column of each known label; absent labels contribute nothing
+    n = 0
+    for offset, index, labels in (
+        (OFFS_SERVICES, SERVICES_IDX, services),
+        (OFFS_GOALS, GOALS_IDX, goals),
+        (OFFS_LANGUAGES, LANGUAGES_IDX, languages),
+    ):
+        for label in labels:
+            j = index.get(label)
+            if j is not None:
+                active[n] = offset + j
+                n += 1
+    return _nearest_cluster(x, active[:n], PROJ_W, PROJ_B)
+
+# Cluster ids for a batch, given its (N, 4) numeric fields and one label list per player
+# for each categorical column
+def _cluster_batch(X, services, goals, languages):
+    # Cluster scores from the numeric fields
+    scores = X @ PROJ_W[:4] + PROJ_B
+
+    # Encode categorical lists: collect every active (row, column) pair
+    # through the label lookup tables, then add their weights in one scatter
+    rows, cols = [], []
+    for offset, index, labels in (
+        (OFFS_SERVICES, SERVICES_IDX, services),
+        (OFFS_GOALS, GOALS_IDX, goals),
+        (OFFS_LANGUAGES, LANGUAGES_IDX, languages),
+    ):
+        for i, player_labels in enumerate(labels):
+            for label in set(player_labels):
+                j = index.get(label)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(offset + j)
+    np.add.at(scores, rows, PROJ_W[cols])
+    return scores.argmax(axis=1)
+
+# Serialize responses with orjson rather than jsonify
+def json_response(obj, status=200):
+    return app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY), status=status, mimetype="application/json"
+    )
 
 # --- Endpoint Documentation using docstrings ---
 
@@ -97,42 +264,27 @@ players_db = []
     }
 })
 def cluster_player():
-    d = request.json
     try:
-        # Encode categorical lists
-        services_encoded = encoders["services"].transform([d["desiredServices"]])
-        goals_encoded = encoders["goals"].transform([d["goals"]])
-        lang_encoded = encoders["languages"].transform([d["languages"]])
-
-        # Numeric fields
-        level = levels_map.get(d["level"], 1)
-        rank = d.get("rank", 0)
-        budget = d.get("maxBudgetPerSession", 0)
-        travel = d.get("travelDistance", 0)
-
-        # Combine features
-        X = np.concatenate(
-            [[rank, budget, travel, level],
-             services_encoded[0], goals_encoded[0], lang_encoded[0]]
-        ).reshape(1, -1)
-
-        # Scale and predict
-        X_scaled = scaler.transform(X)
-        cluster = int(model.predict(X_scaled)[0])
-
-        # Find top 5 similar players in same cluster
-        similar_players = (
-            data[data["cluster"] == cluster][["id", "level", "rank", "maxBudgetPerSession"]]
-            .head(5)
-            .to_dict(orient="records")
+        d = profile_decoder.decode(request.get_data())
+        cluster = _predict(
+            d.level,
+            d.rank,
+            d.maxBudgetPerSession,
+            d.travelDistance,
+            tuple(sorted(set(d.desiredServices))),
+            tuple(sorted(set(d.goals))),
+            tuple(sorted(set(d.languages))),
         )
 
-        return jsonify({
+        # Top 5 similar players in same cluster
+        similar_players = RECS.get(cluster, []) if HAS_RECS else []
+
+        return json_response({
             "cluster": cluster,
             "recommendedPlayers": similar_players
         })
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return json_response({"error": str(e)}, 400)
 
 @app.route("/players", methods=["GET", "POST"])
 @swag_from({
@@ -160,13 +312,17 @@ def cluster_player():
 })
 def manage_players():
     if request.method == "GET":
-        return jsonify(players_db)
+        rows = players_db().execute("SELECT body FROM players ORDER BY rowid")
+        return json_response([orjson.loads(body) for (body,) in rows])
     
     if request.method == "POST":
-        player = request.json
+        try:
+            player = orjson.loads(request.get_data())
+        except orjson.JSONDecodeError as e:
+            return json_response({"error": str(e)}, 400)
         player["id"] = str(uuid.uuid4())
-        players_db.append(player)
-        return jsonify({"id": player["id"], "message": "Player added successfully"})
+        players_db().execute("INSERT INTO players (id, body) VALUES (?, ?)", (player["id"], orjson.dumps(player)))
+        return json_response({"id": player["id"], "message": "Player added successfully"})
 
 @app.route("/players/<player_id>", methods=["DELETE"])
 @swag_from({
@@ -186,9 +342,8 @@ def manage_players():
     }
 })
 def delete_player(player_id):
-    global players_db
-    players_db = [p for p in players_db if p["id"] != player_id]
-    return jsonify({"message": "Player deleted successfully"})
+    players_db().execute("DELETE FROM players WHERE id = ?", (player_id,))
+    return json_response({"message": "Player deleted successfully"})
 
 @app.route("/cluster-all", methods=["POST"])
 @swag_from({
@@ -205,7 +360,7 @@ def delete_player(player_id):
                 'items': {
                     'type': 'object',
                     'properties': {
-                        'id': {'type': 'string', 'description': 'Player unique ID.'},
+                        'id': {'type': 'string', 'description': 'Player unique ID (string or integer), echoed back as sent.'},
                         'desiredServices': {'type': 'array', 'items': {'type': 'string'}},
                         'goals': {'type': 'array', 'items': {'type': 'string'}},
                         'languages': {'type': 'array', 'items': {'type': 'string'}},
@@ -241,39 +396,92 @@ def delete_player(player_id):
 })
 def cluster_all_players():
     try:
-        players = request.json
-        results = []
-        
-        for player in players:
-            # Encode categorical lists
-            services_encoded = encoders["services"].transform([player["desiredServices"]])
-            goals_encoded = encoders["goals"].transform([player["goals"]])
-            lang_encoded = encoders["languages"].transform([player["languages"]])
-
-            # Numeric fields
-            level = levels_map.get(player["level"], 1)
-            rank = player.get("rank", 0)
-            budget = player.get("maxBudgetPerSession", 0)
-            travel = player.get("travelDistance", 0)
-
-            # Combine features
-            X = np.concatenate(
-                [[rank, budget, travel, level],
-                 services_encoded[0], goals_encoded[0], lang_encoded[0]]
-            ).reshape(1, -1)
-
-            # Scale and predict
-            X_scaled = scaler.transform(X)
-            cluster = int(model.predict(X_scaled)[0])
-            
-            results.append({
-                "id": player["id"],
-                "cluster": cluster
-            })
-        
-        return jsonify(results)
+        players = batch_decoder.decode(request.get_data())
+        if not players:
+            return json_response([])
+
+        n = len(players)
+        X = np.empty((n, 4), dtype=np.float32)
+
+        # Numeric fields
+        X[:, 0] = np.fromiter((p.rank for p in players), dtype=np.float32, count=n)
+        X[:, 1] = np.fromiter((p.maxBudgetPerSession for p in players), dtype=np.float32, count=n)
+        X[:, 2] = np.fromiter((p.travelDistance for p in players), dtype=np.float32, count=n)
+        X[:, 3] = np.fromiter((levels_map.get(p.level, 1) for p in players), dtype=np.float32, count=n)
+
+        clusters = _cluster_batch(
+            X,
+            [p.desiredServices for p in players],
+            [p.goals for p in players],
+            [p.languages for p in players],
+        )
+
+        results = [{"id": p.id, "cluster": int(c)} for p, c in zip(players, clusters)]
+        return json_response(results)
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return json_response({"error": str(e)}, 400)
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=6005, debug=True)
\ No newline at end of file
+@app.route("/cluster-all-columnar", methods=["POST"])
+@swag_from({
+    'tags': ['Clustering'],
+    'summary': 'Cluster a batch of players sent as columns.',
+    'description': 'Same as /cluster-all, but the body holds one array per field instead of one object per player. All arrays must have the same length; missing numeric columns default to 0.',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'id': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Player unique IDs (strings or integers), echoed back as sent.'},
+                    'desiredServices': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'string'}}},
+                    'goals': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'string'}}},
+                    'languages': {'type': 'array', 'items': {'type': 'array', 'items': {'type': 'string'}}},
+                    'level': {'type': 'array', 'items': {'type': 'string', 'enum': list(levels_map.keys())}},
+                    'rank': {'type': 'array', 'items': {'type': 'number'}},
+                    'maxBudgetPerSession': {'type': 'array', 'items': {'type': 'number'}},
+                    'travelDistance': {'type': 'array', 'items': {'type': 'number'}}
+                },
+                'required': ['id', 'desiredServices', 'goals', 'languages', 'level']
+            }
+        }
+    ],
+    'responses': {
+        '200': {
+            'description': 'Batch clustering successful; cluster[i] belongs to id[i].',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'id': {'type': 'array', 'items': {'type': 'string'}},
+                    'cluster': {'type': 'array', 'items': {'type': 'integer'}}
+                }
+            }
+        },
+        '400': {
+            'description': 'Error during batch clustering.',
+            'schema': {'type': 'object', 'properties': {'error': {'type': 'string'}}}
+        }
+    }
+})
+def cluster_all_columnar():
+    try:
+        columns = columns_decoder.decode(request.get_data())
+        n = len(columns.id)
+        numeric = (columns.rank, columns.maxBudgetPerSession, columns.travelDistance)
+        lengths = {len(c) for c in (columns.level, columns.desiredServices, columns.goals, columns.languages)}
+        lengths.update(len(c) for c in numeric if c is not None)
+        if lengths - {n}:
+            raise ValueError("All columns must have the same length")
+
+        # Numeric fields, one array conversion per column; missing columns stay 0
+        X = np.zeros((n, 4), dtype=np.float32)
+        for j, column in enumerate(numeric):
+            if column is not None:
+                X[:, j] = np.asarray(column, dtype=np.float32)
+        X[:, 3] = np.fromiter((levels_map.get(level, 1) for level in columns.level), dtype=np.float32, count=n)
+
+        clusters = _cluster_batch(X, columns.desiredServices, columns.goals, columns.languages)
+        return json_response({"id": columns.id, "cluster": clusters.tolist()})
+    except Exception as e:
+        return json_response({"error": str(e)}, 400)
@@ -0,0 +1,87 @@
+import random
+import sys
+import warnings
+
+import joblib
+import numpy as np
+
+import api
+import api1
+import api2
+import api3
+
+# Compares the APIs' folded scoring path (_predict, plus _cluster_batch where the
+# API has one) with the sklearn pipeline it replaces: MultiLabelBinarizer.transform,
+# scaler.transform and model.predict. Run after train.py: `python check_predict.py`
+
+warnings.filterwarnings("ignore", message=".*unknown class.*")
+
+model = joblib.load("player_cluster_model.pkl")
+scaler = joblib.load("scaler.pkl")
+encoders = joblib.load("encoders.pkl")
+
+rng = random.Random(0)
+
+
+def random_labels(classes):
+    # Known labels, an unknown one, and duplicates
+    labels = rng.sample(list(classes) + ["unknown label"], rng.randint(0, 3))
+    return labels + rng.sample(labels, rng.randint(0, len(labels)))
+
+
+profiles = [
+    {
+        "level": rng.choice(list(api3.levels_map) + ["unknown level"]),
+        "rank": round(rng.uniform(0, 7), 1),
+        "maxBudgetPerSession": rng.randint(10, 150),
+        "travelDistance": rng.randint(0, 30),
+        "desiredServices": random_labels(encoders["services"].classes_),
+        "goals": random_labels(encoders["goals"].classes_),
+        "languages": random_labels(encoders["languages"].classes_),
+    }
+    for _ in range(1000)
+]
+
+# --- REFERENCE ---
+X = np.concatenate(
+    [
+        [[p["rank"], p["maxBudgetPerSession"], p["travelDistance"], api3.levels_map.get(p["level"], 1)] for p in profiles],
+        encoders["services"].transform([p["desiredServices"] for p in profiles]),
+        encoders["goals"].transform([p["goals"] for p in profiles]),
+        encoders["languages"].transform([p["languages"] for p in profiles]),
+    ],
+    axis=1
+)
+expected = model.predict(scaler.transform(X))
+
+# --- FOLDED PATH ---
+failed = False
+for module in (api, api1, api2, api3):
+    results = [("_predict", [
+        module._predict(
+            p["level"],
+            p["rank"],
+            p["maxBudgetPerSession"],
+            p["travelDistance"],
+            tuple(sorted(set(p["desiredServices"]))),
+            tuple(sorted(set(p["goals"]))),
+            tuple(sorted(set(p["languages"]))),
+        )
+        for p in profiles
+    ])]
+    if hasattr(module, "_cluster_batch"):
+        results.append(("_cluster_batch", module._cluster_batch(
+            X[:, :4].astype(np.float32),
+            [p["desiredServices"] for p in profiles],
+            [p["goals"] for p in profiles],
+            [p["languages"] for p in profiles],
+        )))
+    for name, got in results:
+        mismatches = int((np.asarray(got) != expected).sum())
+        if mismatches:
+            failed = True
+            print(f"❌ {module.__name__}.{name}: {mismatches}/{len(profiles)} profiles differ from scaler + model.predict")
+
+if failed:
+    sys.exit(1)
+print(f"✅ Folded predict matches scaler + model.predict on {len(profiles)} random profiles")
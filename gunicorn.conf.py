@@ -0,0 +1,12 @@
+import multiprocessing
+
+# Production server for the APIs, e.g. `gunicorn -c gunicorn.conf.py api3:app`
+bind = "0.0.0.0:6005"
+workers = multiprocessing.cpu_count()
+worker_class = "gthread"
+threads = 4
+
+# Import the app in the master before forking: the label tables, recommendation table
+# and compiled numba kernel are built once, the projection arrays are mmapped once and
+# shared by every worker, and load errors surface at startup
+preload_app = True
@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
 import joblib
+import os
 from sklearn.preprocessing import MultiLabelBinarizer, StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans
 
 # Load dataset
 data = pd.read_json("dataset.json")
@@ -46,19 +47,48 @@ scaler = StandardScaler()
 X_scaled = scaler.fit_transform(X)
 
 # --- CLUSTERING ---
-kmeans = KMeans(n_clusters=4, random_state=42)
+# Mini-batches only kick in once the dataset outgrows batch_size; below that
+# each step uses every row, i.e. full-batch training
+kmeans = MiniBatchKMeans(n_clusters=4, batch_size=1024, n_init=3, random_state=42)
 data["cluster"] = kmeans.fit_predict(X_scaled)
 
+# --- FUSED PREDICT ---
+# Scaler + KMeans folded into one projection: with z = (x - mean) / scale,
+# argmin_k ||z - C_k||^2 == argmax_k (2 C_k . z - C_k . C_k) == argmax_k (x . W_k + b_k)
+# for W_k = 2 C_k / scale and b_k = -C_k . C_k - W_k . mean. Working on the raw x
+# keeps the one-hot blocks sparse: each active label just adds its row of W.
+# Stored as float32: K and D are tiny, so halving the bytes matters more than
+# the precision, which is far below the gap between centroid scores.
+w = 2 * kmeans.cluster_centers_ / scaler.scale_
+proj_w = np.ascontiguousarray(w.T, dtype=np.float32)  # (D, K)
+proj_b = (-(kmeans.cluster_centers_ ** 2).sum(axis=1) - w @ scaler.mean_).astype(np.float32)
+
 # --- SAVE MODEL ---
+def save_array_atomic(path, arr):
+    # The APIs mmap these files: write a new file and rename it over the old one, so
+    # running workers keep reading the old inode instead of a truncated one (SIGBUS)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, arr)
+    os.replace(path + ".tmp", path)
+
 joblib.dump(kmeans, "player_cluster_model.pkl")
 joblib.dump(scaler, "scaler.pkl")
+save_array_atomic("proj_w.npy", proj_w)
+save_array_atomic("proj_b.npy", proj_b)
 joblib.dump({
     "services": mlb_services,
     "goals": mlb_goals,
     "languages": mlb_lang
 }, "encoders.pkl")
+# Serving only needs each encoder's classes, not the fitted objects
+joblib.dump({
+    "services": tuple(mlb_services.classes_),
+    "goals": tuple(mlb_goals.classes_),
+    "languages": tuple(mlb_lang.classes_)
+}, "classes.pkl")
 
 # --- SAVE RESULTS ---
+data[["id", "level", "rank", "maxBudgetPerSession"]].to_parquet("dataset.parquet", index=False)
 data[["id", "cluster"]].to_json("player_clusters.json", orient="records")
 
 print("✅ Model trained and saved as player_cluster_model.pkl")